@@ -2,14 +2,45 @@
 Resolve domain names using DNS messages sent via UPD, without 3rd-party libraries.
 """
 
-import binascii
-import ctypes
+import asyncio
+import functools
 import random
 import socket
 import struct
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from enum import IntEnum
-from io import BytesIO
+# Precompiled structs for the message sections, so the format strings
+# are parsed once at import instead of on every call:
+_HDR = struct.Struct("!HHHHHH")  # header: id, flags, qd/an/ns/ar counts
+_Q_TAIL = struct.Struct("!HH")  # question tail: qtype, qclass
+_RR = struct.Struct("!HHIH")  # resource record: type, class, ttl, rdlength
+
+# Lookup tables for human-readable descriptions of RCODE/QTYPE/QCLASS values,
+# so the printing helpers do a single dict hit instead of an if/elif chain:
+_RCODE_STR = {
+    0: "No error",
+    1: "Format error (name server could not interpret your request)",
+    2: "Server failure",
+    3: "Name Error (Domain does not exist)",
+    4: "Not implemented (name server does not support your request type)",
+    5: "Refused (name server refused your request for policy reasons)",
+}
+_QTYPE_STR = {
+    1: "A",
+    2: "NS",
+    5: "CNAME",
+    15: "MX",
+    28: "AAAA",
+}
+_QCLASS_STR = {
+    1: "IN",
+}
+
+# Record types checked per resource record, hoisted to plain ints so the
+# hot branches compare without enum attribute lookups:
+_T_A, _T_AAAA, _T_NS = 1, 28, 2
 
 
 @dataclass
@@ -19,7 +50,10 @@ class DNSHeader:
     Reference: https://datatracker.ietf.org/doc/html/rfc1035#page-26
     """
 
-    id: int = random.randint(0, 65535)  # 16 bit: message identifier
+    # 16 bit: message identifier. Note the default_factory: a plain
+    # `random.randint(...)` default is evaluated once at class creation,
+    # so every header would share the same id.
+    id: int = field(default_factory=lambda: random.getrandbits(16))
     qr: int = 0b0  # 1 bit: flag, query 0, response 1
     opcode: int = 0b0000  # 4 bit: kind of query, 0 = standard query
     aa: int = 0b0  # 1 bit: authoritative answer
@@ -34,18 +68,9 @@ class DNSHeader:
     arcount: int = 0b0000000000000000  # 16 bit: number of additional records
 
     def as_hex_str(self) -> str:
-        params = str(self.qr)
-        params += str(self.opcode).zfill(4)
-        params += str(self.aa) + str(self.tc) + str(self.rd) + str(self.ra)
-        params += str(self.z).zfill(3)
-        params += str(self.rcode).zfill(4)
-
-        # Convert `params` "binary in string" to int, then format it as hex number in string:
-        params = f"{int(params, base=2):04x}"
-
         header = ""
         header += f"{self.id:04x}"
-        header += params
+        header += f"{self._pack_flags():04x}"
         header += f"{self.qdcount:04x}"
         header += f"{self.ancount:04x}"
         header += f"{self.nscount:04x}"
@@ -53,26 +78,29 @@ class DNSHeader:
 
         return header
 
+    def _pack_flags(self) -> int:
+        """
+        Combine flag fields into the 16-bit flags word of the header.
+        :return: flags word as int
+        """
+        return (
+            (self.qr << 15)
+            | (self.opcode << 11)
+            | (self.aa << 10)
+            | (self.tc << 9)
+            | (self.rd << 8)
+            | (self.ra << 7)
+            | (self.z << 4)
+            | self.rcode
+        )
+
     def _rcode_to_str(self) -> str:
         """
         Convert response code to description string.
         Reference: https://datatracker.ietf.org/doc/html/rfc1035#page-27
         :return: RCODE description
         """
-        if self.rcode == RCODE.NO_ERROR:
-            return "No error"
-        elif self.rcode == RCODE.FORMAT_ERROR:
-            return "Format error (name server could not interpret your request)"
-        elif self.rcode == RCODE.SERVER_FAILURE:
-            return "Server failure"
-        elif self.rcode == RCODE.NAME_ERROR:
-            return "Name Error (Domain does not exist)"
-        elif self.rcode == RCODE.NOT_IMPLEMENTED:
-            return "Not implemented (name server does not support your request type)"
-        elif self.rcode == RCODE.REFUSED:
-            return "Refused (name server refused your request for policy reasons)"
-        else:
-            return "WARNING: Unknown rcode"
+        return _RCODE_STR.get(self.rcode, "WARNING: Unknown rcode")
 
     def pretty_print(self):
         print("Message ID: %i" % self.id)
@@ -83,63 +111,40 @@ class DNSHeader:
         )
 
     @staticmethod
-    def from_bytes(reader: BytesIO) -> "DNSHeader":
+    def from_bytes(buf: bytes, offset: int = 0) -> tuple["DNSHeader", int]:
         """
         Parse header from DNS message and create `DNSHeader` instance.
+        :param buf: full DNS message
+        :param offset: position of the header in `buf`
+        :return: parsed header and offset of the first byte after it
         """
-        header_struct = struct.Struct("!H2sHHHH")
-        header_raw = reader.read(header_struct.size)
-
-        # Print out the message header
-        bitfields = DNSHeaderBitFields()
-        bitfields_raw = bytearray()
-        # Unpack format "!H2sHHHH" will spread 12 raw_bytes to the following variables:
+        # Unpack format "!HHHHHH" will spread 12 raw_bytes to the following variables:
         (
             hdr_message_id,  # int, 2 b
-            bitfields_raw,  # bytes, 2 b
+            flags,  # int, 2 b
             hdr_qdcount,  # int, 2 b
             hdr_ancount,  # int, 2 b
             hdr_nscount,  # int, 2 b
             hdr_arcount,  # int, 2 b
-        ) = header_struct.unpack(header_raw)
+        ) = _HDR.unpack_from(buf, offset)
 
-        # Move raw header bytes to the `bitfields` struct memory location
-        # so we can access its members:
-        ctypes.memmove(ctypes.addressof(bitfields), bitfields_raw, 2)
-
-        return DNSHeader(
+        # Split the 16-bit flags word into its fields with shifts and masks:
+        header = DNSHeader(
             id=hdr_message_id,
-            qr=bitfields.qr,
-            opcode=bitfields.opcode,
-            aa=bitfields.aa,
-            tc=bitfields.tc,
-            rd=bitfields.rd,
-            ra=bitfields.ra,
-            z=bitfields.z,
-            rcode=bitfields.rcode,
+            qr=(flags >> 15) & 0b1,
+            opcode=(flags >> 11) & 0b1111,
+            aa=(flags >> 10) & 0b1,
+            tc=(flags >> 9) & 0b1,
+            rd=(flags >> 8) & 0b1,
+            ra=(flags >> 7) & 0b1,
+            z=(flags >> 4) & 0b111,
+            rcode=flags & 0b1111,
             qdcount=hdr_qdcount,
             ancount=hdr_ancount,
             nscount=hdr_nscount,
             arcount=hdr_arcount,
         )
-
-
-class DNSHeaderBitFields(ctypes.BigEndianStructure):
-    """
-    Represents DNS message header parameters, 16 bit long.
-    Reference: https://datatracker.ietf.org/doc/html/rfc1035#page-26
-    """
-
-    _fields_ = [
-        ("qr", ctypes.c_uint16, 1),
-        ("opcode", ctypes.c_uint16, 4),
-        ("aa", ctypes.c_uint16, 1),
-        ("tc", ctypes.c_uint16, 1),
-        ("rd", ctypes.c_uint16, 1),
-        ("ra", ctypes.c_uint16, 1),
-        ("z", ctypes.c_uint16, 3),
-        ("rcode", ctypes.c_uint16, 4),
-    ]
+        return header, offset + _HDR.size
 
 
 class RCODE(IntEnum):
@@ -185,48 +190,38 @@ class DNSQuestion:
     Reference: https://datatracker.ietf.org/doc/html/rfc1035#section-4.1.2
     """
 
-    domain: str
+    # Parsed questions keep the domain as raw bytes - the str form is only
+    # needed for printing, so it is decoded lazily in __str__:
+    domain: bytes | str
     qtype: QTYPE = QTYPE.A  # 16 bit: type = A records, i.e. "host address"
     qclass: QCLASS = QCLASS.IN  # 16 bit: class = Internet
 
     def __str__(self):
+        domain = self.domain.decode() if isinstance(self.domain, bytes) else self.domain
         return (
-            f"DNSQuestion(domain={self.domain}, qtype={self.qtype} ({qtype_to_str(self.qtype)}), "
+            f"DNSQuestion(domain={domain}, qtype={self.qtype} ({qtype_to_str(self.qtype)}), "
             f"qclass={self.qclass} ({class_to_str(self.qclass)}))"
         )
 
-    def _encode_domain_name(self) -> str:
+    def _encode_qname_bytes(self) -> bytes:
         """
-        Encode domain name for DNS Question in hex string representation.
-        :return: encoded domain name encoded as hex string
+        Encode domain name for DNS Question in wire format.
+        :return: domain name encoded as bytes
         """
-        # QNAME a domain name represented as a sequence of labels, where each label consists of
-        # a length octet followed by that number of octets. The domain name terminates with the
-        # zero length octet for the null label of the root. Note that this field may be an odd
-        # number of octets; no padding is used.
-        qname = ""
-        addr_parts = self.domain.split(".")
-        for part in addr_parts:
-            addr_len = f"{len(part):02x}"
-            addr_part = binascii.hexlify(part.encode())
-            qname += addr_len
-            qname += addr_part.decode()
-
-        qname += "00"  # Terminating bit for QNAME
-        return qname
+        return _encode_qname(self.domain)
 
     def as_hex_str(self) -> str:
-        question = self._encode_domain_name()
+        question = self._encode_qname_bytes().hex()
         question += f"{self.qtype:04x}"  # 16 bit
         question += f"{self.qclass:04x}"  # 16 bit
         return question
 
     @staticmethod
-    def from_bytes(reader: BytesIO) -> "DNSQuestion":
-        name = decode_name(reader)
-        data = reader.read(4)
-        qtype, qclass = struct.unpack("!HH", data)
-        return DNSQuestion(domain=name.decode(), qtype=qtype, qclass=qclass)
+    def from_bytes(buf: bytes, offset: int) -> tuple["DNSQuestion", int]:
+        name, offset = decode_name(buf, offset)
+        qtype, qclass = _Q_TAIL.unpack_from(buf, offset)
+        question = DNSQuestion(domain=name, qtype=qtype, qclass=qclass)
+        return question, offset + _Q_TAIL.size
 
 
 @dataclass
@@ -251,29 +246,28 @@ class DNSRecord:
         )
 
     @staticmethod
-    def from_bytes(reader: BytesIO) -> "DNSRecord":
-        name = decode_name(reader)
+    def from_bytes(buf: bytes, offset: int) -> tuple["DNSRecord", int]:
+        name, offset = decode_name(buf, offset)
         # HHIH means: 2-byte type, 2-byte class, 4-byte ttl, 2-byte rdlength = 10 bytes
         # Reference: https://datatracker.ietf.org/doc/html/rfc1035#section-4.1.3
-        record_struct = struct.Struct("!HHIH")
-        data = reader.read(record_struct.size)
-        type_, class_, ttl, rdlength = record_struct.unpack(data)
+        type_, class_, ttl, rdlength = _RR.unpack_from(buf, offset)
 
-        rdata_pos = reader.tell()
-        rdata = reader.read(rdlength)
+        rdata_pos = offset + _RR.size
+        rdata = buf[rdata_pos : rdata_pos + rdlength]
 
         # Parse address (IP or domain) from rdata
-        if type_ == QTYPE.A:
+        if type_ == _T_A:
             address = socket.inet_ntop(socket.AF_INET, rdata)
-        elif type_ == QTYPE.AAAA:
+        elif type_ == _T_AAAA:
             address = socket.inet_ntop(socket.AF_INET6, rdata)
-        elif type_ == QTYPE.NS:
-            reader.seek(rdata_pos)
-            address = decode_name(reader=reader).decode()
+        elif type_ == _T_NS:
+            # Names can be compressed, so decode from the full message:
+            address = decode_name(buf, rdata_pos)[0].decode()
         else:
             address = "WARNING: Unknown address format."
 
-        return DNSRecord(name, type_, class_, ttl, rdata, address)
+        record = DNSRecord(name, type_, class_, ttl, rdata, address)
+        return record, rdata_pos + rdlength
 
 
 @dataclass
@@ -290,12 +284,24 @@ class DNSMessage:
     additionals: list[DNSRecord]
 
     @staticmethod
-    def from_bytes(reader: BytesIO) -> "DNSMessage":
-        header = DNSHeader.from_bytes(reader)
-        questions = [DNSQuestion.from_bytes(reader) for _ in range(header.qdcount)]
-        answers = [DNSRecord.from_bytes(reader) for _ in range(header.ancount)]
-        authorities = [DNSRecord.from_bytes(reader) for _ in range(header.nscount)]
-        additionals = [DNSRecord.from_bytes(reader) for _ in range(header.arcount)]
+    def from_bytes(buf: bytes) -> "DNSMessage":
+        header, offset = DNSHeader.from_bytes(buf)
+
+        questions = []
+        for _ in range(header.qdcount):
+            question, offset = DNSQuestion.from_bytes(buf, offset)
+            questions.append(question)
+
+        answers, authorities, additionals = [], [], []
+        for records, count in (
+            (answers, header.ancount),
+            (authorities, header.nscount),
+            (additionals, header.arcount),
+        ):
+            for _ in range(count):
+                record, offset = DNSRecord.from_bytes(buf, offset)
+                records.append(record)
+
         return DNSMessage(
             header=header,
             questions=questions,
@@ -306,10 +312,9 @@ class DNSMessage:
 
     def pretty_print(self):
         self.header.pretty_print()
-        [print(q) for q in self.questions]
-        [print(answ) for answ in self.answers]
-        [print(ns) for ns in self.authorities]
-        [print(ar) for ar in self.additionals]
+        for section in (self.questions, self.answers, self.authorities, self.additionals):
+            for record in section:
+                print(record)
 
     @property
     def nameserver_ip(self) -> str | None:
@@ -331,18 +336,7 @@ def qtype_to_str(qtype: int) -> str:
     :param qtype: query type code
     :return: QTYPE description
     """
-    if qtype == QTYPE.A:
-        return "A"
-    elif qtype == QTYPE.NS:
-        return "NS"
-    elif qtype == QTYPE.CNAME:
-        return "CNAME"
-    elif qtype == QTYPE.MX:
-        return "MX"
-    elif qtype == QTYPE.AAAA:
-        return "AAAA"
-    else:
-        return "WARNING: Record type not decoded"
+    return _QTYPE_STR.get(qtype, "WARNING: Record type not decoded")
 
 
 def class_to_str(qclass: int) -> str:
@@ -352,40 +346,47 @@ def class_to_str(qclass: int) -> str:
     :param qclass: QCLASS code
     :return: QCLASS description
     """
-    if qclass == QCLASS.IN:
-        return "IN"
-    else:
-        return "WARNING: Class not decoded"
+    return _QCLASS_STR.get(qclass, "WARNING: Class not decoded")
 
 
-def decode_name(reader: BytesIO) -> bytes:
-    parts = []
-    while (length := reader.read(1)[0]) != 0:
-        # Check if two upper bits are set - it means we have to "decompress" the name:
-        if length & 0b1100_0000:
-            parts.append(decode_compressed_name(length, reader))
-            break
-        else:
-            parts.append(reader.read(length))
-    return b".".join(parts)
+@functools.lru_cache(maxsize=1024)
+def _encode_qname(domain: str) -> bytes:
+    """
+    Encode domain name in DNS wire format. Cached, so recursive resolution
+    does not re-split and re-encode the same domain on every hop.
+
+    QNAME is a domain name represented as a sequence of labels, where each label
+    consists of a length octet followed by that number of octets. The domain name
+    terminates with the zero length octet for the null label of the root. Note that
+    this field may be an odd number of octets; no padding is used.
+
+    :param domain: domain name to encode
+    :return: domain name encoded as bytes
+    """
+    parts = [part.encode() for part in domain.split(".")]
+    return b"".join(bytes((len(part),)) + part for part in parts) + b"\x00"
 
 
-def decode_compressed_name(length, reader):
+def decode_name(buf: bytes, offset: int) -> tuple[bytes, int]:
     """
-    Reference : https://datatracker.ietf.org/doc/html/rfc1035#section-4.1.4
-    :param length:
-    :param reader:
-    :return:
+    Decode domain name at `offset` in the DNS message.
+    Handles "compressed" names, continued at the offset encoded in a pointer.
+    Reference: https://datatracker.ietf.org/doc/html/rfc1035#section-4.1.4
+    :param buf: full DNS message
+    :param offset: position of the name in `buf`
+    :return: decoded name and offset of the first byte after it
     """
-    # Get bottom 6 bits and the following byte, and convert the two bytes to int
-    pointer_bytes = bytes([length & 0b0011_1111]) + reader.read(1)
-    pointer = struct.unpack("!H", pointer_bytes)[0]
-    # Save position, seek to position decoded above, read name, restore position:
-    current_pos = reader.tell()
-    reader.seek(pointer)
-    result = decode_name(reader)
-    reader.seek(current_pos)
-    return result
+    parts = []
+    while (length := buf[offset]) != 0:
+        # Check if two upper bits are set - it means we have to "decompress" the name.
+        # Bottom 6 bits plus the following byte give the offset the name continues at:
+        if length & 0b1100_0000:
+            pointer = ((length & 0b0011_1111) << 8) | buf[offset + 1]
+            parts.append(decode_name(buf, pointer)[0])
+            return b".".join(parts), offset + 2
+        parts.append(buf[offset + 1 : offset + 1 + length])
+        offset += 1 + length
+    return b".".join(parts), offset + 1
 
 
 def create_dns_message(domain: str) -> bytes:
@@ -394,14 +395,21 @@ def create_dns_message(domain: str) -> bytes:
     :param domain: domain name we want to look up
     :return: DNS message
     """
-    header = DNSHeader(rd=0)  # No recursion
-    question = DNSQuestion(domain=domain)
+    qname = _encode_qname(domain)
+
+    # Fill a single preallocated buffer: 12-byte header, QNAME, 4-byte question tail.
+    message = bytearray(_HDR.size + len(qname) + _Q_TAIL.size)
+    # Flags are all zero - no recursion desired, we walk the hierarchy ourselves:
+    _HDR.pack_into(message, 0, random.getrandbits(16), 0, 1, 0, 0, 0)
+    message[_HDR.size : _HDR.size + len(qname)] = qname
+    _Q_TAIL.pack_into(message, _HDR.size + len(qname), QTYPE.A, QCLASS.IN)
+    return bytes(message)
 
-    message = header.as_hex_str()
-    message += question.as_hex_str()
 
-    # Convert string hex representation into real bytes
-    return binascii.unhexlify(message)
+# UDP socket reused by all queries of a thread - created on first use, so
+# recursive resolution does not pay socket setup/teardown syscalls per hop.
+# One socket per thread, so parallel resolves can't steal each other's replies:
+_LOCAL = threading.local()
 
 
 def send_udp_message(message: bytes, address: str, port: int = 53) -> bytes:
@@ -412,16 +420,70 @@ def send_udp_message(message: bytes, address: str, port: int = 53) -> bytes:
     :param port: DNS server port
     :return: data received from DNS server
     """
-    server_address = (address, port)
+    sock = getattr(_LOCAL, "udp_socket", None)
+    if sock is None:
+        sock = _LOCAL.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _LOCAL.recv_buffer = bytearray(4096)
+
+    sock.sendto(message, (address, port))
+    # Receive into the preallocated buffer instead of letting recvfrom allocate
+    # a fresh one. The response is copied out once, since parsed records keep
+    # slices of it alive past the next query:
+    received = sock.recv_into(_LOCAL.recv_buffer)
+    return bytes(memoryview(_LOCAL.recv_buffer)[:received])
+
+
+# Caches of resolved answers and per-zone nameserver IPs, so repeated and
+# related lookups skip whole UDP round-trips. Values are (address, expiry),
+# honouring the TTL of the records they came from:
+_ANSWER_CACHE: dict[str, tuple[str, float]] = {}
+_NS_CACHE: dict[str, tuple[str, float]] = {}
+
+
+def _cache_get(cache: dict[str, tuple[str, float]], key: str) -> str | None:
+    """
+    Get a non-expired address from the cache, dropping the entry if its TTL ran out.
+    :param cache: cache to look in
+    :param key: domain name to look up
+    :return: cached address or None
+    """
+    hit = cache.get(key)
+    if hit is None:
+        return None
+
+    address, expires_at = hit
+    if time.monotonic() >= expires_at:
+        # Tolerant pop: concurrent resolves may race to evict the same
+        # expired entry, and losing that race is fine:
+        cache.pop(key, None)
+        return None
+    return address
+
+
+def _cache_records(message: DNSMessage):
+    """
+    Remember addresses from a received DNS message:
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        sock.sendto(message, server_address)
-        data, _ = sock.recvfrom(4096)
-    finally:
-        sock.close()
+    - A answers go to the answer cache;
+    - NS authority records paired with their glue A records go to the
+      per-zone nameserver cache.
 
-    return data
+    :param message: message received from nameserver
+    """
+    now = time.monotonic()
+
+    for answer in message.answers:
+        if answer.type_ == _T_A:
+            _ANSWER_CACHE[answer.name.decode()] = (answer.address, now + answer.ttl)
+
+    glue = {record.name.decode(): record for record in message.additionals if record.type_ == _T_A}
+    for authority in message.authorities:
+        if authority.type_ != _T_NS:
+            continue
+        glue_record = glue.get(authority.address)
+        if glue_record:
+            ttl = min(authority.ttl, glue_record.ttl)
+            _NS_CACHE[authority.name.decode()] = (glue_record.address, now + ttl)
 
 
 def resolve(domain: str) -> str:
@@ -430,13 +492,27 @@ def resolve(domain: str) -> str:
     :param domain: domain name to resolve
     :return: IP address of the `domain`
     """
+    if cached := _cache_get(_ANSWER_CACHE, domain):
+        return cached
+
     # Root server IP (list of all root servers - https://www.iana.org/domains/root/servers):
     nameserver = "198.41.0.4"
+
+    # Start the walk from the deepest zone we already know a nameserver for,
+    # instead of going through the root every time:
+    labels = domain.split(".")
+    for start in range(len(labels)):
+        zone = ".".join(labels[start:])
+        if cached_ns := _cache_get(_NS_CACHE, zone):
+            nameserver = cached_ns
+            break
+
     while True:
         print(f"Querying {nameserver} for {domain}")
         msg = create_dns_message(domain)
         response = send_udp_message(msg, nameserver)
-        received_msg = DNSMessage.from_bytes(reader=BytesIO(response))
+        received_msg = DNSMessage.from_bytes(response)
+        _cache_records(received_msg)
 
         if len(received_msg.answers):
             return received_msg.answers[0].address
@@ -448,7 +524,11 @@ def resolve(domain: str) -> str:
             raise Exception(f"Can't resolve {domain}!")
 
 
-if __name__ == "__main__":
+async def main():
+    """
+    Resolve the whole batch of domains in parallel - resolution is I/O-bound,
+    so total wall time is that of the slowest chain, not the sum of all.
+    """
     domains = [
         "hazadus.ru",
         "rss.hazadus.ru",
@@ -456,4 +536,10 @@ if __name__ == "__main__":
         "python.org",
         "twitter.com",
     ]
-    [print(f"{domain} IP is", resolve(domain), "\n") for domain in domains]
+    ips = await asyncio.gather(*(asyncio.to_thread(resolve, domain) for domain in domains))
+    for domain, ip in zip(domains, ips):
+        print(f"{domain} IP is", ip, "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,24 +2,82 @@
 DNS resolver (using dnspython library).
 """
 
+import time
+
 import dns.message
 import dns.query
 import dns.rdatatype
 
+# Set to True to print every record of the received DNS messages:
+DEBUG = False
+
+# Cache of resolved A records: domain name -> (IP, expiry timestamp),
+# honouring the TTL of the answer it came from:
+_CACHE: dict[str, tuple[str, float]] = {}
+
+
+def _cache_get(name: str) -> str | None:
+    """Get a non-expired IP from the cache, dropping the entry if its TTL ran out.
+    :param name: domain name to look up
+    :return: IP or None
+    """
+    hit = _CACHE.get(name)
+    if hit is None:
+        return None
+
+    ip, expires_at = hit
+    if time.monotonic() >= expires_at:
+        del _CACHE[name]
+        return None
+    return ip
+
+
+def _cache_put(reply: dns.message.Message):
+    """Remember A answers from the DNS message together with their TTL.
+    :param reply: message received from nameserver
+    """
+    now = time.monotonic()
+    for record in reply.answer:
+        if record.rdtype == dns.rdatatype.A:
+            name = record.name.to_text(omit_final_dot=True)
+            _CACHE[name] = (record[0].address, now + record.ttl)
+
 
 def resolve(domain: str):
     root_nameserver = "198.41.0.4"
 
+    if ip := _cache_get(domain):
+        print(f"resolve cached {ip=}")
+        return ip
+
+    # Names waiting to be resolved, the original domain at the bottom.
+    # Nameserver names go on top of the stack instead of recursing:
+    pending = [domain]
     nameserver = root_nameserver
+    query_name = None
+    dns_query = None
     while True:
-        reply = query(domain, nameserver)
+        # The query message is identical for every hop asking about the same
+        # name - rebuild it only when the name on top of the stack changes:
+        name = pending[-1]
+        if name != query_name:
+            query_name = name
+            dns_query = dns.message.make_query(name, "A")
+
+        reply = query(dns_query, nameserver)
 
         ip = get_answer(reply)
 
         if ip:
-            # We got IP right away:
-            print(f"resolve {ip=}")
-            return ip
+            _cache_put(reply)
+            pending.pop()
+            if not pending:
+                # We got IP of the original domain:
+                print(f"resolve {ip=}")
+                return ip
+            # We got IP of a nameserver - continue the outer name from it:
+            nameserver = ip
+            continue
 
         next_nameserver = get_glue(reply)
         if next_nameserver:
@@ -28,13 +86,16 @@ def resolve(domain: str):
             nameserver = next_nameserver
         else:
             # We got domain name of the next nameserver to query
-            nameserver_domain = get_nameserver(reply)
+            nameserver_domain = str(get_nameserver(reply)).rstrip(".")
             print(f"resolve {nameserver_domain=}")
-            nameserver = resolve(nameserver_domain)
+            if cached_ip := _cache_get(nameserver_domain):
+                nameserver = cached_ip
+            else:
+                pending.append(nameserver_domain)
+                nameserver = root_nameserver
 
 
-def query(name: str, nameserver: str) -> dns.message.Message:
-    dns_query = dns.message.make_query(name, "A")
+def query(dns_query: dns.message.Message, nameserver: str) -> dns.message.Message:
     return dns.query.udp(dns_query, nameserver)
 
 
@@ -43,10 +104,13 @@ def get_answer(reply: dns.message.Message) -> str | None:
     :param reply: message received from nameserver
     :return: IP or None
     """
-    for record in reply.answer:
-        print(f"get_answer {record=}")
-        if record.rdtype == dns.rdatatype.A:
-            return record[0].address
+    if DEBUG:
+        for record in reply.answer:
+            print(f"get_answer {record=}")
+    return next(
+        (record[0].address for record in reply.answer if record.rdtype == dns.rdatatype.A),
+        None,
+    )
 
 
 def get_glue(reply: dns.message.Message) -> str | None:
@@ -62,10 +126,13 @@ def get_glue(reply: dns.message.Message) -> str | None:
     :param reply: message received from nameserver
     :return: IP or None
     """
-    for record in reply.additional:
-        print(f"get_glue {record=}")
-        if record.rdtype == dns.rdatatype.A:
-            return record[0].address
+    if DEBUG:
+        for record in reply.additional:
+            print(f"get_glue {record=}")
+    return next(
+        (record[0].address for record in reply.additional if record.rdtype == dns.rdatatype.A),
+        None,
+    )
 
 
 def get_nameserver(reply: dns.message.Message) -> str | None:
@@ -73,10 +140,13 @@ def get_nameserver(reply: dns.message.Message) -> str | None:
     :param reply: message received from nameserver
     :return: domain name or None
     """
-    for record in reply.authority:
-        print(f"get_nameserver {record=}")
-        if record.rdtype == dns.rdatatype.NS:
-            return record[0].target
+    if DEBUG:
+        for record in reply.authority:
+            print(f"get_nameserver {record=}")
+    return next(
+        (record[0].target for record in reply.authority if record.rdtype == dns.rdatatype.NS),
+        None,
+    )
 
 
 if __name__ == "__main__":
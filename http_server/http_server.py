@@ -5,10 +5,21 @@ Serves static files, or directory listings.
 Built to learn HTTP protocol.
 """
 
+import logging
+import os
+
 import settings
 from serve import serve_forever
 
 if __name__ == "__main__":
+    # Show per-request logs when the server is run directly; importers of
+    # the modules stay quiet unless they configure logging themselves.
+    # Set e.g. LOG_LEVEL=WARNING to silence per-request logs under load:
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "DEBUG"),
+        format="%(asctime)s %(message)s",
+    )
+
     try:
         serve_forever(settings.DEFAULT_HOST, settings.DEFAULT_PORT)
     except KeyboardInterrupt:
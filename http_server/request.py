@@ -2,15 +2,26 @@
 Request-related code.
 """
 
-import os.path
+import re
 import socket
-from io import BufferedReader
+from functools import cached_property
 from typing import Tuple
-from urllib.parse import ParseResult, parse_qs, unquote, urlparse
+from urllib.parse import ParseResult, unquote, unquote_plus
 
 import settings
 from exceptions import HTTPError
 
+# Request head (request line + headers) must fit into this many bytes:
+MAX_HEAD_SIZE = 8192
+
+# One header line: token name, colon, optional whitespace around the value.
+# Compiled once, so the whole header block is scanned in a single C-level pass:
+_HEADER_RE = re.compile(rb"([!-9;-~]+):[ \t]*([^\r\n]*?)[ \t]*\r\n")
+
+# URL structure from RFC 3986 appendix B - one C-level match extracts scheme,
+# authority, path, query and fragment, instead of the urlparse state machine:
+_URL_RE = re.compile(r"^(?:([^:/?#]+):)?(?://([^/?#]*))?([^?#]*)(?:\?([^#]*))?(?:#(.*))?$")
+
 
 class Request:
     """
@@ -26,66 +37,110 @@ class Request:
         target: str,
         version: str,
         headers: dict,
-        request_file: BufferedReader,
         client_address: Tuple[str, int],
     ):
         self.method = method
         self.target = target
         self.version = version
         self.headers = headers
-        self.request_file = request_file
         self.client_host, self.client_port = client_address
 
+        # Split the target once with plain string operations - the full
+        # urlparse state machine is only run if `url` is actually touched:
+        path, _, self._query_string = target.partition("?")
+        self.path = unquote(path)
+
     def __str__(self):
+        # Deliberately cheap - this is formatted for every logged request.
+        # Use `verbose()` when the headers are actually needed:
         return (
-            f"<Request: {self.client_host}:{self.client_port} {self.method} {self.target} {self.version} "
-            f"{self.headers}>"
+            f"<Request: {self.client_host}:{self.client_port} "
+            f"{self.method} {self.target} {self.version}>"
         )
 
-    @property
-    def url(self) -> ParseResult:
-        return urlparse(self.target)
+    def verbose(self) -> str:
+        """
+        Full representation of the request, including all headers.
 
-    @property
-    def path(self) -> str:
-        return unquote(self.url.path)
+        :return: string with request summary and headers
+        """
+        return f"{self} headers={self.headers}"
 
-    @property
-    def query(self) -> dict[str, list[str]]:
-        return parse_qs(self.url.query)
+    # The parsed forms of `target` never change, so each one is computed
+    # at most once per request instead of on every property access:
+    @cached_property
+    def url(self) -> ParseResult:
+        # Unlike urlparse, path parameters are left in the path and the
+        # `params` field stays empty - nothing here uses them:
+        scheme, netloc, path, query, fragment = _URL_RE.match(self.target).groups()
+        return ParseResult(
+            scheme or "", netloc or "", path or "", "", query or "", fragment or ""
+        )
 
-    @property
+    @cached_property
+    def query(self) -> dict[str, list[str]]:
+        query: dict[str, list[str]] = {}
+        if self._query_string:
+            for pair in self._query_string.split("&"):
+                key, _, value = pair.partition("=")
+                # Pairs without a value are skipped, like parse_qs does:
+                if not value:
+                    continue
+                query.setdefault(unquote_plus(key), []).append(unquote_plus(value))
+        return query
+
+    @cached_property
     def content_type(self) -> str:
         """
         Return MIME type based on file extension in request path.
 
         :return: MIME type based on file extension, or `DEFAULT_CONTENT_TYPE`
         """
-        _, extension = os.path.splitext(self.path)
-        content_type = settings.EXTENSION_TO_MIME_TYPE.get(
+        # `rfind` is enough to pull the extension out of an URL path - no need
+        # for the full os.path.splitext machinery:
+        dot = self.path.rfind(".")
+        extension = self.path[dot:] if dot != -1 else ""
+        return settings.EXTENSION_TO_MIME_TYPE.get(
             extension, settings.DEFAULT_CONTENT_TYPE
         )
-        return content_type
 
 
-def parse_request(connection: socket.socket) -> Request:
+def parse_request(connection: socket.socket, buffered: bytes = b"") -> Tuple[Request, bytes]:
     """
     Parse all neded data from request message into `Request` instance.
 
-    References:
-     - https://docs.python.org/3/library/socket.html#socket.socket.makefile
+    A pipelining client may pack several requests into one segment, so bytes
+    received past the end of this head are handed back to the caller to be
+    passed in as `buffered` when parsing the next request on the connection.
+
+    Reference:
      - https://developer.mozilla.org/en-US/docs/Web/HTTP/Messages
     :param connection: client connection socket
+    :param buffered: bytes already received past the previous request's head
+    :return: filled `Request` instance and the leftover bytes after its head
+    """
+    head, leftover = _read_head(connection, buffered)
+    return build_request(head, connection.getpeername()), leftover
+
+
+def build_request(head: bytes, client_address: Tuple[str, int]) -> Request:
+    """
+    Build `Request` instance from the already-read request head.
+
+    Shared between the threaded and asyncio server loops, which read the head
+    off the wire in different ways.
+
+    :param head: request line and headers, without the terminating empty line
+    :param client_address: client host and port
     :return: filled `Request` instance
     """
-    # Represent socket connection as file-like object:
-    request_file = connection.makefile("rb")
+    request_line, _, header_block = head.partition(b"\r\n")
 
-    method, target, version = _parse_request_line(request_file)
+    method, target, version = _parse_request_line(request_line)
     if version not in settings.SUPPORTED_VERSIONS:
         raise Exception(f"Unsupported HTTP version: {version}")
 
-    headers = _parse_request_headers(request_file)
+    headers = _parse_request_headers(header_block)
 
     # Check `Hosts` header
     if not headers.get("Host"):
@@ -94,20 +149,56 @@ def parse_request(connection: socket.socket) -> Request:
     if headers.get("Host") not in settings.ALLOWED_HOSTS:
         raise HTTPError(404, "Not found")
 
-    client_address = connection.getpeername()
-    return Request(method, target, version, headers, request_file, client_address)
+    return Request(method, target, version, headers, client_address)
+
+
+def _read_head(connection: socket.socket, buffered: bytes = b"") -> Tuple[bytes, bytes]:
+    """
+    Read the request head (request line and headers) from the socket.
 
+    Small requests fit into the preallocated buffer and are read with a single
+    `recv_into`, with no file-object wrapper around the socket. Already-
+    buffered bytes from the previous read are consumed before the socket is
+    touched, and anything received past the terminating empty line is
+    returned so the next request on the connection doesn't lose it.
 
-def _parse_request_line(request_file: BufferedReader) -> Tuple[str, str, str]:
+    :param connection: client connection socket
+    :param buffered: bytes already received past the previous request's head
+    :return: request head without the empty line terminating it, and the
+        leftover bytes received past it
+    :raise HTTPError: 400 error if the head is incomplete or too large
+    """
+    buf = bytearray(MAX_HEAD_SIZE)
+    view = memoryview(buf)
+    total = min(len(buffered), MAX_HEAD_SIZE)
+    buf[:total] = buffered[:total]
+
+    while (end := buf.find(b"\r\n\r\n", 0, total)) == -1:
+        if total == MAX_HEAD_SIZE:
+            raise HTTPError(400, "Bad request")
+        received = connection.recv_into(view[total:])
+        if not received:
+            # EOF before any bytes is a client done with a keep-alive
+            # connection, not a malformed request:
+            if not total:
+                raise ConnectionResetError
+            # Connection closed in the middle of the head:
+            raise HTTPError(400, "Bad request")
+        total += received
+
+    return bytes(view[:end]), bytes(view[end + 4 : total])
+
+
+def _parse_request_line(request_line_bytes: bytes) -> Tuple[str, str, str]:
     """
     Parse request line into HTTP method, target, and HTTP version tuple.
 
     Reference:
      - https://developer.mozilla.org/en-US/docs/Web/HTTP/Messages#request_line
+    :param request_line_bytes: first line of the request head
     :return: tuple of HTTP method, target, and HTTP version
     """
-    line_bytes = request_file.readline()
-    request_line = str(line_bytes, settings.HEADER_ENCODING).rstrip("\r\n")
+    request_line = str(request_line_bytes, settings.HEADER_ENCODING)
     tokens = request_line.split(" ")
 
     # Expect exactly three tokens in request line - method, target, version:
@@ -118,26 +209,18 @@ def _parse_request_line(request_file: BufferedReader) -> Tuple[str, str, str]:
     return method, target, version
 
 
-def _parse_request_headers(request_file: BufferedReader) -> dict:
+def _parse_request_headers(header_block: bytes) -> dict:
     """
     Simplified HTTP header parser. Does not take into account multiple headers with same names.
 
     Reference:
      - https://developer.mozilla.org/en-US/docs/Web/HTTP/Messages#headers
+    :param header_block: header lines from the request head
     :return: dict of header names and values
     """
-    header_lines = []
-    while True:
-        line = request_file.readline()
-        # Empty line means the end of headers:
-        if line in (b"\r\n", b"\n", b""):
-            break
-        header_lines.append(line)
-
-    headers = {}
-    for header in header_lines:
-        header = header.decode(settings.HEADER_ENCODING)
-        key, value = header.split(":", 1)
-        headers[key] = value.rstrip("\r\n").lstrip()
-
-    return headers
+    encoding = settings.HEADER_ENCODING
+    return {
+        key.decode(encoding): value.decode(encoding)
+        # The block comes without the final line break, restore it for the regex:
+        for key, value in _HEADER_RE.findall(header_block + b"\r\n")
+    }
@@ -2,15 +2,130 @@
 Response-related code.
 """
 
-import os.path
+import mmap
+import os
 import socket
-from datetime import datetime
-from email import utils
+import stat
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
 
 import settings
 from exceptions import HTTPError
 from request import Request
 
+# Pre-encoded status lines for the statuses this server actually sends;
+# anything else falls back to formatting on the fly:
+_STATUS_LINES: dict[int, bytes] = {
+    200: b"HTTP/1.1 200 OK\r\n",
+    301: b"HTTP/1.1 301 Moved Permanently\r\n",
+    304: b"HTTP/1.1 304 Not Modified\r\n",
+    400: b"HTTP/1.1 400 Bad Request\r\n",
+    404: b"HTTP/1.1 404 Not Found\r\n",
+    500: b"HTTP/1.1 500 Internal Server Error\r\n",
+}
+
+# Headers identical for every response, encoded once at import:
+_CONST_HEADERS = f"Server: {settings.SERVER_TITLE}\r\n".encode(settings.HEADER_ENCODING)
+_CLOSE_HEADER = b"Connection: close\r\n"
+_KEEP_ALIVE_HEADERS = (
+    f"Connection: keep-alive\r\nKeep-Alive: timeout={settings.KEEP_ALIVE_TIMEOUT}\r\n"
+).encode(settings.HEADER_ENCODING)
+
+# Content-Type header lines, fully encoded at import - one per known
+# extension, so serving a static file splices in a ready byte literal:
+_MIME_HEADER_BYTES = {
+    extension: f"Content-Type: {mime_type}\r\n".encode(settings.HEADER_ENCODING)
+    for extension, mime_type in settings.EXTENSION_TO_MIME_TYPE.items()
+}
+_DEFAULT_MIME_HEADER = f"Content-Type: {settings.DEFAULT_CONTENT_TYPE}\r\n".encode(
+    settings.HEADER_ENCODING
+)
+
+
+@lru_cache(maxsize=2048)
+def content_type_header_for(path: str) -> bytes:
+    """
+    Return the pre-encoded Content-Type header line for the path.
+
+    Memoized per path, so repeated requests for the same asset skip even the
+    extension lookup.
+
+    :param path: request path of the static file
+    :return: encoded header line, ready to splice into the response head
+    """
+    dot = path.rfind(".")
+    extension = path[dot:] if dot != -1 else ""
+    return _MIME_HEADER_BYTES.get(extension, _DEFAULT_MIME_HEADER)
+
+
+# Compact directory listing page - no pretty-printing indentation, so the
+# generated body carries no filler whitespace over the wire:
+_DIR_TEMPLATE = (
+    "<!DOCTYPE html>"
+    '<html lang="en">'
+    '<head><meta charset="UTF-8">'
+    '<meta name="viewport" content="width=device-width, initial-scale=1.0">'
+    "<title>Directory listing</title></head>"
+    "<body><h1>{title}</h1><ul>{items}</ul></body>"
+    "</html>"
+)
+
+# In-memory cache of small static files: resolved path -> (mtime, contents).
+# Hot assets (styles, scripts, icons) are served without touching the disk;
+# entries are validated against the file's mtime, so edits are picked up.
+# Dicts keep insertion order, which gives us cheap LRU eviction - hits are
+# reinserted at the end, the first key is always the least recently used:
+_FILE_CACHE_MAX_FILE_SIZE = 256 * 1024
+_FILE_CACHE_MAX_TOTAL_SIZE = 64 * 1024 * 1024
+_FILE_CACHE: dict[str, tuple[float, bytes]] = {}
+_file_cache_size = 0
+# Worker threads share the cache; the pop/reinsert LRU touch and the
+# multi-step eviction are not atomic, so every access takes this lock:
+_file_cache_lock = threading.Lock()
+
+
+def _file_cache_get(path: str, mtime: float) -> bytes | None:
+    """
+    Get cached file contents if they are still current.
+
+    :param path: resolved filesystem path of the file
+    :param mtime: current modification time of the file on disk
+    :return: file contents, or None on miss or stale entry
+    """
+    with _file_cache_lock:
+        hit = _FILE_CACHE.get(path)
+        if hit is None or hit[0] != mtime:
+            return None
+        # Move the entry to the end, marking it as recently used:
+        _FILE_CACHE[path] = _FILE_CACHE.pop(path)
+        return hit[1]
+
+
+def _file_cache_put(path: str, mtime: float, body: bytes):
+    """
+    Remember file contents, evicting least recently used entries over the cap.
+
+    :param path: resolved filesystem path of the file
+    :param mtime: modification time the contents were read at
+    :param body: file contents
+    """
+    global _file_cache_size
+
+    with _file_cache_lock:
+        old = _FILE_CACHE.pop(path, None)
+        if old is not None:
+            _file_cache_size -= len(old[1])
+
+        while _FILE_CACHE and _file_cache_size + len(body) > _FILE_CACHE_MAX_TOTAL_SIZE:
+            oldest = next(iter(_FILE_CACHE))
+            _, evicted = _FILE_CACHE.pop(oldest)
+            _file_cache_size -= len(evicted)
+
+        _FILE_CACHE[path] = (mtime, body)
+        _file_cache_size += len(body)
+
 
 class Response:
     """
@@ -26,11 +141,20 @@ class Response:
         reason: str,
         headers: dict | None = None,
         body: bytes | None = None,
+        file_path: str | None = None,
+        file_size: int | None = None,
+        raw_headers: bytes = b"",
     ):
         self.status = status
         self.reason = reason
         self._headers = headers
         self.body = body
+        # Already-encoded header lines, spliced into the head verbatim:
+        self.raw_headers = raw_headers
+        # Static files are not read into memory - `send_response` streams
+        # them to the client straight from the file:
+        self.file_path = file_path
+        self.file_size = file_size
 
     def __str__(self):
         return (
@@ -40,44 +164,110 @@ class Response:
 
     @property
     def headers(self) -> dict:
-        return {
-            "Connection": "close",
-            "Server": settings.SERVER_TITLE,
-            "Date": utils.format_datetime(datetime.now()),
-            **self._headers,
-        }
+        """
+        Response-specific headers. The constant `Connection`/`Server` pair and
+        the `Date` header are appended by `send_response` itself.
+        """
+        return self._headers or {}
 
 
-def send_response(connection: socket.socket, response: Response):
+def render_head(response: Response, keep_alive: bool = False) -> bytearray:
     """
-    Serialize `Response` instance to proper HTTP response format and write it to client socket.
+    Serialize status line and headers of the response into a single buffer.
+
+    Shared between the threaded (`send_response`) and asyncio server loops.
 
     Reference:
      - https://developer.mozilla.org/en-US/docs/Web/HTTP/Messages#http_responses
-    :param connection: client socket connection to send response to
-    :param response: `Response` instance to send
+    :param response: `Response` instance to serialize
+    :param keep_alive: whether the connection stays open after this response
+    :return: buffer with the status line, all headers, and the empty line
     """
-    response_file = connection.makefile("wb")
+    buf = bytearray()
+
+    # HTTP status line
+    status_line = _STATUS_LINES.get(response.status)
+    if status_line is None:
+        status_line = f"HTTP/1.1 {response.status} {response.reason}\r\n".encode(
+            settings.HEADER_ENCODING
+        )
+    buf += status_line
 
-    # Write HTTP status line
-    status_line = f"HTTP/1.1 {response.status} {response.reason}\r\n"
-    response_file.write(status_line.encode(settings.HEADER_ENCODING))
+    # Constant headers are pre-encoded at import; only the Date is formatted
+    # per response (formatdate is noticeably cheaper than
+    # format_datetime(datetime.now())):
+    buf += _KEEP_ALIVE_HEADERS if keep_alive else _CLOSE_HEADER
+    buf += _CONST_HEADERS
+    buf += f"Date: {formatdate(usegmt=True)}\r\n".encode(settings.HEADER_ENCODING)
 
-    # Write all response headers
-    if response.headers:
-        for key, value in response.headers.items():
-            header_line = f"{key}: {value}\r\n"
-            response_file.write(header_line.encode(settings.HEADER_ENCODING))
+    # Response-specific headers - pre-encoded ones go in as-is:
+    buf += response.raw_headers
+    for key, value in response.headers.items():
+        buf += f"{key}: {value}\r\n".encode(settings.HEADER_ENCODING)
 
     # Empty line means the end of headers
-    response_file.write(b"\r\n")
+    buf += b"\r\n"
+    return buf
 
-    # Write the body, if present
+
+def send_response(connection: socket.socket, response: Response, keep_alive: bool = False):
+    """
+    Serialize `Response` instance to proper HTTP response format and send it to client socket.
+
+    The whole response is assembled in a single buffer and pushed with one
+    `sendall`, instead of going through a per-line buffered file object.
+
+    :param connection: client socket connection to send response to
+    :param response: `Response` instance to send
+    :param keep_alive: whether the connection stays open after this response
+    """
+    buf = render_head(response, keep_alive)
+
+    # Stream file-backed responses straight from the file:
+    if response.file_path is not None:
+        connection.sendall(buf)
+        with open(response.file_path, "rb") as file:
+            _send_file_body(connection, file, response.file_size)
+        return
+
+    # The body, if present
     if response.body:
-        response_file.write(response.body)
+        buf += response.body
+
+    connection.sendall(buf)
 
-    response_file.flush()
-    response_file.close()
+
+def _send_file_body(connection: socket.socket, file, size: int):
+    """
+    Send file contents to the client socket with `os.sendfile`, so the kernel
+    copies pages from the page cache to the socket without a round-trip
+    through userspace.
+
+    Falls back to an mmap-backed send when `sendfile` is not usable for the
+    file/socket pair - the mapping is demand-paged by the kernel and passed to
+    `sendall` via the buffer protocol, so the file is still never copied into
+    a Python bytes object.
+
+    :param connection: client socket connection to send the file to
+    :param file: file opened in binary mode
+    :param size: number of bytes to send
+    """
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(connection.fileno(), file.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        return
+    except OSError:
+        # Part of the file already went out - cannot cleanly start over:
+        if offset:
+            raise
+
+    if size:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            connection.sendall(mapped)
 
 
 def send_error(connection: socket.socket, error: HTTPError):
@@ -97,93 +287,134 @@ def load_path(request: Request) -> Response:
     """
     Load static file or directory listing, depending on request.
 
+    The filesystem is touched exactly once here - `realpath` resolves the
+    requested path (collapsing any `..` so the client cannot break out of the
+    static directory), and a single `stat` both checks existence and tells
+    files from directories. The resolved path and stat result are passed down,
+    so the helpers don't repeat the work.
+
     :param request: request to handle
     :return: `Response` instance filled with static file or directory listing
     """
-    path = os.path.sep.join([settings.STATIC_DIR, request.path])
+    path = os.path.realpath(os.path.join(settings.STATIC_DIR, request.path.lstrip("/")))
 
-    # Ensure that the path exists, and user can't break out of our base directory:
-    if not path.startswith(settings.STATIC_DIR) or not os.path.exists(path):
+    if path != settings.STATIC_DIR and not path.startswith(settings.STATIC_DIR + os.sep):
         raise HTTPError(404, "Not found")
 
-    if os.path.isfile(path):
-        return _load_static_file(request)
+    try:
+        file_stat = os.stat(path)
+    except OSError as ex:
+        raise HTTPError(404, f"Not found. {ex}")
+
+    if stat.S_ISREG(file_stat.st_mode):
+        return _load_static_file(request, path, file_stat)
+
+    if stat.S_ISDIR(file_stat.st_mode):
+        return _load_directory_listing(request, path)
 
-    if os.path.isdir(path):
-        return _load_directory_listing(request)
+    raise HTTPError(404, "Not found")
 
 
-def _load_static_file(request: Request) -> Response:
+def _load_static_file(request: Request, path: str, file_stat: os.stat_result) -> Response:
     """
-    Load static file into Response instance.
+    Create Response serving a static file.
+
+    The file contents are not read here - only the size is taken from the
+    stat result, and `send_response` streams the file to the client.
 
     :param request: Request instance to process
+    :param path: resolved filesystem path of the file
+    :param file_stat: `os.stat` result for the file
     :return: Response instance properly initialized with required data
-    :raise HTTPError: 404 error if file not found
     """
-    path = os.path.sep.join([settings.STATIC_DIR, request.path])
-
-    try:
-        with open(path, "rb") as file:
-            body = file.read()
-    except Exception as ex:
-        raise HTTPError(404, f"Not found. {ex}")
-
+    # Weak validator from the file's mtime and size - cheap to compute and
+    # exact to the nanosecond, unlike the one-second HTTP date:
+    etag = f'W/"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(304, "Not Modified", headers={"Content-Length": 0, "ETag": etag})
+
+    # If the client's cached copy is still fresh, skip the body entirely.
+    # HTTP dates have one-second resolution, so the mtime is truncated before
+    # comparing. Checked only when no ETag was offered - If-None-Match takes
+    # precedence per RFC 9110:
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if "If-None-Match" in request.headers:
+        if_modified_since = None
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            since = None
+        if since is not None and since.tzinfo is None:
+            # RFC 9110: dates without a zone are GMT
+            since = since.replace(tzinfo=timezone.utc)
+        modified_at = datetime.fromtimestamp(int(file_stat.st_mtime), timezone.utc)
+        if since is not None and modified_at <= since:
+            return Response(304, "Not Modified", headers={"Content-Length": 0})
+
+    file_size = file_stat.st_size
+
+    content_type_header = content_type_header_for(request.path)
     headers = {
-        "Content-Type": request.content_type,
-        "Content-Length": len(body),
+        "Content-Length": file_size,
+        # Let clients revalidate with If-None-Match/If-Modified-Since next time:
+        "ETag": etag,
+        "Last-Modified": formatdate(file_stat.st_mtime, usegmt=True),
     }
 
-    return Response(200, "OK", headers=headers, body=body)
+    # Small files are served from the in-memory cache - the body then goes out
+    # in the same sendall as the headers, with zero disk I/O on a hit:
+    if file_size <= _FILE_CACHE_MAX_FILE_SIZE:
+        body = _file_cache_get(path, file_stat.st_mtime)
+        if body is None:
+            with open(path, "rb") as file:
+                body = file.read()
+            _file_cache_put(path, file_stat.st_mtime, body)
+        return Response(
+            200, "OK", headers=headers, body=body, raw_headers=content_type_header
+        )
+
+    return Response(
+        200,
+        "OK",
+        headers=headers,
+        file_path=path,
+        file_size=file_size,
+        raw_headers=content_type_header,
+    )
 
 
-def _load_directory_listing(request: Request) -> Response:
+def _load_directory_listing(request: Request, path: str) -> Response:
     """
     Create `Response` with directory listing.
 
     :param request: request to handle
+    :param path: resolved filesystem path of the directory
     :return: `Response` instance with directory listing
     """
     host = request.headers.get("Host")
-    path = os.path.sep.join([settings.STATIC_DIR, request.path])
 
-    # Sort in a way that directories come first in the list:
-    dir_list = sorted(
-        os.listdir(path),
-        key=lambda name_: not os.path.isdir(os.path.sep.join([path, name_])),
-    )
+    # `scandir` returns entries with the file type already filled in from the
+    # directory read, so there is no extra `stat` call per entry. Sort so that
+    # directories come first in the list:
+    with os.scandir(path) as entries:
+        dir_list = sorted(entries, key=lambda entry: (not entry.is_dir(), entry.name))
 
-    listing = ""
+    lines = []
     if not request.path == "/":
         parent_dir = os.path.abspath(os.path.sep.join([path, "../"]))
         parent_dir = parent_dir[len(settings.STATIC_DIR) :]
-        listing = (
-            '<li>📁 <a href="/">.</a></li>\n'
-            f'<li>📁 <a href="{parent_dir}/">..</a></li>\n'
-        )
+        lines.append('<li>📁 <a href="/">.</a></li>')
+        lines.append(f'<li>📁 <a href="{parent_dir}/">..</a></li>')
 
-    for name in dir_list:
-        full_path = os.path.sep.join([path, name])
-        icon = "📁" if os.path.isdir(full_path) else "📄"
-        listing += (
-            f'<li>{icon} <a href="{os.path.join(request.path, name)}">{name}</a></li>\n'
+    for entry in dir_list:
+        icon = "📁" if entry.is_dir() else "📄"
+        lines.append(
+            f'<li>{icon} <a href="{os.path.join(request.path, entry.name)}">{entry.name}</a></li>'
         )
 
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-        <head>
-          <meta charset="UTF-8" />
-          <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-          <title>Directory listing</title>
-        </head>
-
-        <body>
-          <h1>{host}{request.path}</h1>
-          <ul>\n{listing}</ul>
-        </body>
-    </html>
-    """
+    # One join + one format instead of quadratic `+=` concatenation:
+    html = _DIR_TEMPLATE.format(title=f"{host}{request.path}", items="".join(lines))
 
     # Encode *before* measuring `len(body)`!
     body = html.encode("utf-8")
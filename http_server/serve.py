@@ -2,64 +2,118 @@
 Contains stuff related with main server loop - serve and handle client requests.
 """
 
+import logging
+import os
 import socket
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 import settings
 from exceptions import HTTPError
 from request import Request, parse_request
 from response import Response, load_path, send_error, send_response
 
+# Per-request messages go through the logger with lazy %-formatting, so
+# stringifying requests/responses and timestamping only happens when the
+# level is actually enabled:
+log = logging.getLogger("http_server")
+
+# Dispatch table built once at import - one dict lookup picks the handler
+# for the method; new methods get registered here, not coded into the check:
+_METHOD_TABLE: dict[str, Callable[[Request], Response]] = {
+    "GET": load_path,
+}
+
 
 def serve_forever(host: str, port: int):
     """
     Infinitely acccept client connections and process requests.
 
+    Each accepted connection is handed off to a worker thread, so one slow
+    client does not block everyone else - the requests are I/O-bound, and
+    socket calls release the GIL.
+
     :param host: HTTP server host
     :param port: HTTP server port
     """
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, proto=0)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Workers are I/O-bound, so size the pool well past the core count:
+    max_workers = (os.cpu_count() or 1) * 8
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http_worker")
+    # Backpressure: when all workers are busy, the accept loop blocks here
+    # instead of queueing connections inside the pool without bound:
+    slots = threading.Semaphore(max_workers)
 
     try:
         server_socket.bind((host, port))
-        server_socket.listen()
+        # A deep backlog, so connection bursts queue instead of being refused
+        # while the workers are busy:
+        server_socket.listen(1024)
         print(f"☣️🚀 {settings.SERVER_TITLE} waiting for connection on {host}:{port}")
 
         while True:
             connection, (client_host, client_port) = server_socket.accept()
-            print(datetime.now(), f"🔌{client_host}:{client_port} connected...")
-
-            try:
-                _serve_client(connection)
-            except Exception as ex:
-                print("Failed to serve client", ex)
+            # Send response segments as soon as we have them, don't wait to batch:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # A roomy send buffer, so sendall/sendfile of a whole response
+            # lands in the kernel in fewer syscalls:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            # Let the kernel detect dead peers, so idle keep-alive
+            # connections don't pin worker slots forever:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            log.debug("🔌%s:%s connected...", client_host, client_port)
+
+            slots.acquire()
+            pool.submit(_serve_client, connection, slots)
     finally:
+        pool.shutdown(wait=False)
         server_socket.close()
 
 
-def _serve_client(connection: socket.socket):
+def _serve_client(connection: socket.socket, slots: threading.Semaphore):
     """
-    Process request, then send back the response.
+    Process requests on the connection until the client is done.
+
+    HTTP/1.1 connections are persistent: the same TCP connection carries one
+    request after another until the client asks to close or goes idle past
+    the keep-alive timeout - saving a handshake per request.
 
     :param connection: client connection socket
+    :param slots: worker slot to give back when the connection is done
     """
     try:
-        request = parse_request(connection)
-        print(datetime.now(), "↘️", request)
-
-        response = _handle_request(request)
-        print(datetime.now(), "↗️", response)
+        connection.settimeout(settings.KEEP_ALIVE_TIMEOUT)
 
-        send_response(connection, response)
+        # Bytes a pipelining client sent past the previous request's head:
+        leftover = b""
+        while True:
+            request, leftover = parse_request(connection, leftover)
+            log.debug("↘️ %s", request)
+
+            response = _handle_request(request)
+            log.debug("↗️ %s", response)
+
+            keep_alive = request.headers.get("Connection", "").lower() != "close"
+            send_response(connection, response, keep_alive)
+            if not keep_alive:
+                break
+    except TimeoutError:
+        # Client went idle - close our end quietly:
+        pass
     except ConnectionResetError:
         connection = None
     except Exception as ex:
-        print(datetime.now(), "Error:", ex)
-        send_error(connection, ex)
+        log.error("Error: %s", ex)
+        try:
+            send_error(connection, ex)
+        except OSError:
+            pass
 
     if connection:
         connection.close()
+    slots.release()
 
 
 def _handle_request(request: Request) -> Response:
@@ -69,9 +123,8 @@ def _handle_request(request: Request) -> Response:
     :param request: request to handle
     :return: filled `Response` instance
     """
-    supported_methods = ["GET"]
-
-    if request.method not in supported_methods:
+    handler = _METHOD_TABLE.get(request.method)
+    if handler is None:
         raise HTTPError(400, f"Method {request.method} is not supported.")
 
-    return load_path(request)
+    return handler(request)
@@ -0,0 +1,150 @@
+"""
+Asyncio variant of the server loop.
+
+One event loop serves all clients, so thousands of slow connections cost a
+coroutine each instead of a thread each. Request parsing and handling are
+shared with the threaded server (`serve.py`) - only the socket I/O differs.
+
+Run directly to try it out:
+    python serve_async.py
+"""
+
+import asyncio
+import logging
+import os
+
+import settings
+from exceptions import HTTPError
+from request import MAX_HEAD_SIZE, build_request
+from response import Response, render_head
+from serve import _handle_request
+
+log = logging.getLogger("http_server")
+
+
+async def serve_forever(host: str, port: int):
+    """
+    Infinitely accept client connections and process requests.
+
+    :param host: HTTP server host
+    :param port: HTTP server port
+    """
+    server = await asyncio.start_server(
+        _serve_client, host, port, limit=MAX_HEAD_SIZE
+    )
+    print(f"☣️🚀 {settings.SERVER_TITLE} (asyncio) waiting for connection on {host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+async def _serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Process request, then send back the response.
+
+    :param reader: stream to read the request from
+    :param writer: stream to send the response to
+    """
+    try:
+        request = await _parse_request(reader, writer)
+        log.debug("↘️ %s", request)
+
+        response = _handle_request(request)
+        log.debug("↗️ %s", response)
+
+        await _send_response(writer, response)
+    except ConnectionResetError:
+        return
+    except Exception as ex:
+        log.error("Error: %s", ex)
+        await _send_async_error(writer, ex)
+
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+
+
+async def _parse_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Read the request head from the stream and parse it into a `Request`.
+
+    :param reader: stream to read the request from
+    :param writer: stream the response will go to (for the client address)
+    :return: filled `Request` instance
+    :raise HTTPError: 400 error if the head is incomplete or too large
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise HTTPError(400, "Bad request")
+
+    client_address = writer.get_extra_info("peername")
+    # `readuntil` includes the separator - drop the terminating empty line:
+    return build_request(head[:-4], client_address)
+
+
+async def _send_response(writer: asyncio.StreamWriter, response: Response):
+    """
+    Serialize the response and send it to the client.
+
+    :param writer: stream to send the response to
+    :param response: `Response` instance to send
+    """
+    writer.write(render_head(response))
+
+    if response.file_path is not None:
+        await writer.drain()
+        loop = asyncio.get_running_loop()
+        with open(response.file_path, "rb") as file:
+            # Zero-copy where the platform supports it, chunked copy otherwise:
+            await loop.sendfile(writer.transport, file, fallback=True)
+        return
+
+    if response.body:
+        writer.write(response.body)
+    await writer.drain()
+
+
+async def _send_async_error(writer: asyncio.StreamWriter, error: Exception):
+    """
+    Send an error response, falling back to 500 for unexpected exceptions.
+
+    :param writer: stream to send the response to
+    :param error: exception to report to the client
+    """
+    try:
+        status = error.status
+        reason = error.reason
+        body = (error.body or error.reason).encode("utf-8")
+    except AttributeError:
+        status = 500
+        reason = "Internal Server Error"
+        body = b"Internal Server Error"
+    response = Response(status, reason, {"Content-Length": len(body)}, body)
+    try:
+        await _send_response(writer, response)
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "DEBUG"),
+        format="%(asctime)s %(message)s",
+    )
+
+    # uvloop drives the same coroutines with a libuv-based loop written in
+    # Cython - a drop-in speedup when it is installed, stdlib loop otherwise:
+    try:
+        import uvloop
+
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+
+    try:
+        run(serve_forever(settings.DEFAULT_HOST, settings.DEFAULT_PORT))
+    except KeyboardInterrupt:
+        print(f"⛔⌨️ {settings.SERVER_TITLE} stopped by user.")
@@ -10,18 +10,20 @@ DEFAULT_PORT = 8000
 STATIC_ROOT = "./static"
 STATIC_DIR = os.path.abspath(STATIC_ROOT)
 SERVER_TITLE = f"Hazardous HTTP Server (Python v.{platform.python_version()})"
-SUPPORTED_VERSIONS = [
+SUPPORTED_VERSIONS = frozenset({
     "HTTP/1.1",
-]
-ALLOWED_HOSTS = [
+})
+ALLOWED_HOSTS = frozenset({
     DEFAULT_HOST,
     f"{DEFAULT_HOST}:{DEFAULT_PORT}",
     "127.0.0.1",
     f"127.0.0.1:{DEFAULT_PORT}",
     "localhost",
     f"localhost:{DEFAULT_PORT}",
-]
+})
 HEADER_ENCODING = "iso-8859-1"
+# How long an idle keep-alive connection is kept open, seconds:
+KEEP_ALIVE_TIMEOUT = 5
 EXTENSION_TO_MIME_TYPE = {
     ".htm": "text/html; charset=utf-8",
     ".html": "text/html; charset=utf-8",
@@ -15,6 +15,11 @@ server_socket.bind(("", 53210))
 # 10 is the max number of connected clients, awaiting response (backlog):
 server_socket.listen(10)
 
+# One reusable receive buffer, instead of a fresh bytes object per recv call.
+# 64 KiB matches a typical kernel receive buffer, so one recv can drain it:
+buffer = bytearray(65536)
+view = memoryview(buffer)
+
 while True:
     # Wait for incoming connection:
     print("Waiting for connection...")
@@ -23,12 +28,13 @@ while True:
     print("Connection from:", client_address)
 
     while True:
-        # Accept data in 1024-byte chunks:
-        data = client_socket.recv(1024)
+        # Accept data straight into the reusable buffer:
+        received = client_socket.recv_into(buffer)
         # Exit loop when there's no more data from client:
-        if not data:
+        if not received:
             break
-        # Send the received data back to client
-        client_socket.sendall(data)
+        # Send the received data back to client (the memoryview slice shares
+        # the buffer - no copy is made):
+        client_socket.sendall(view[:received])
 
     client_socket.close()
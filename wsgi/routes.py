@@ -7,18 +7,54 @@ Example usage:
 
 import json
 import re
-from functools import partial
+from functools import lru_cache, partial
 from typing import Callable, Iterable
 
+# orjson сериализует в байты сразу и в разы быстрее стандартного json;
+# если он не установлен - компактный json.dumps без pretty-print:
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+
+# Ответ 404 всегда одинаковый - собираем его части один раз:
+_NOT_FOUND_STATUS = "404 Not Found"
+_NOT_FOUND_HEADERS = [("Content-Type", "text/plain"), ("Content-Length", "0")]
+_NOT_FOUND_BODY = [b""]
+
 
 class WSGIApp:
 
     def __init__(self):
+        # Точные маршруты и маршруты с переменными храним отдельно:
+        # по точным ищем за O(1) по словарю, по остальным - по списку
+        # заранее скомпилированных регулярных выражений.
         self._routes = {}
+        self._patterns = []
+        # Пути, для которых хэндлер уже не нашёлся - отдаём по ним готовый
+        # 404 без повторного перебора маршрутов:
+        self._not_found = set()
 
-    def route(self, rule: str) -> Callable:
+    def route(self, rule: str, cache: bool = False) -> Callable:
         def decorator(f: Callable) -> Callable:
-            self._routes.update({rule: f})
+            # Для идемпотентных хэндлеров с cache=True результат запоминается
+            # и не пересчитывается на каждый запрос (для маршрутов с
+            # переменными - отдельно для каждого набора значений):
+            handler = lru_cache(maxsize=1024)(f) if cache else f
+            if "<" in rule:
+                # Компилируем правило один раз при регистрации,
+                # а не на каждый запрос:
+                pattern = re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", rule)
+                self._patterns.append((re.compile(f"^{pattern}$"), handler))
+            else:
+                self._routes[rule] = handler
             return f
 
         return decorator
@@ -30,55 +66,51 @@ class WSGIApp:
             return handler
 
         # Если не нашли сходу, пробуем найти хэндлер с переменной
-        for key, handler in self._routes.items():
-            # Ищем имя переменной в key
-            var_names = re.findall(r"<(.+)>", key)
-            if not len(var_names):
-                continue
-
-            var_name = var_names[0]
-
-            # Пробуем вытащить значение переменной из path
-            pattern = key.replace(f"<{var_name}>", "(.+)")
-            matches = re.findall(pattern, path)
-
-            if not len(matches):
-                continue
-
-            # Если значение нашлось, значит это нужный нам хэндлер
-            match = matches[0]
-            kwargs = {var_name: match}
-            return partial(handler, **kwargs)
+        for pattern, handler in self._patterns:
+            match = pattern.match(path)
+            if match:
+                # Значения переменных вытаскиваем прямо из именованных групп
+                return partial(handler, **match.groupdict())
 
     def __call__(self, environ: dict, start_response: Callable) -> Iterable:
         path = environ["PATH_INFO"]
-        handler = self._get_route_handler(path)
 
-        if handler:
-            body = handler()
-            status = "200 OK"
-        else:
-            body = ""
-            status = "404 Not Found"
+        handler = None
+        if path not in self._not_found:
+            handler = self._get_route_handler(path)
+
+        if handler is None:
+            # Запоминаем путь без хэндлера (с потолком, чтобы случайные
+            # адреса не раздували множество до бесконечности):
+            if len(self._not_found) < 1024:
+                self._not_found.add(path)
+            start_response(_NOT_FOUND_STATUS, _NOT_FOUND_HEADERS)
+            return _NOT_FOUND_BODY
+
+        body = handler()
+        # Хэндлеры могут возвращать как строки, так и готовые байты -
+        # байты отдаём клиенту без лишней перекодировки:
+        if not isinstance(body, (bytes, bytearray)):
+            body = body.encode()
 
         headers = [
             ("Content-Type", "text/plain"),
             ("Content-Length", str(len(body))),
         ]
 
-        start_response(status, headers)
+        start_response("200 OK", headers)
 
-        return [body.encode()]
+        return [body]
 
 
 application = WSGIApp()
 
 
-@application.route("/hello")
-def handler_hello() -> str:
-    return json.dumps({"response": "Hello, world!"}, indent=4)
+@application.route("/hello", cache=True)
+def handler_hello() -> bytes:
+    return _dumps({"response": "Hello, world!"})
 
 
-@application.route("/hello/<name>")
-def handler_hello_name(name: str) -> str:
-    return json.dumps({"response": f"Hello, {name}!"}, indent=4)
+@application.route("/hello/<name>", cache=True)
+def handler_hello_name(name: str) -> bytes:
+    return _dumps({"response": f"Hello, {name}!"})
@@ -6,18 +6,38 @@ Usage example:
 """
 
 import io
+import logging
+import os
+import signal
 import socket
 import sys
 from datetime import datetime
 from email import utils
 
+# Request/response dumps go through the logger and are built only when the
+# level is actually enabled - print() would format and lock stdout per request:
+log = logging.getLogger("wsgi_server")
+
+HEADER_ENCODING = "iso-8859-1"
+
+# Status lines the app actually returns, encoded once at import:
+STATUS_LINES = {
+    "200 OK": b"HTTP/1.1 200 OK\r\n",
+    "404 Not Found": b"HTTP/1.1 404 Not Found\r\n",
+}
+
 
 class WSGIServer:
-    request_queue_size = 1
+    # A deep backlog, so connection bursts queue instead of being refused:
+    request_queue_size = 1024
 
     def __init__(self, server_address):
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Several worker processes can bind the same address - the kernel
+        # load-balances incoming connections between them:
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.server_socket.bind(server_address)
         self.server_socket.listen(self.request_queue_size)
 
@@ -25,10 +45,26 @@ class WSGIServer:
         self.server_name = socket.getfqdn(host)
         self.server_port = port
 
+        # Most environ keys never change - build them once and copy the
+        # prototype per request instead of re-inserting ~12 keys every time:
+        self._env_proto = {
+            # Required WSGI variables
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            # Required CGI variables that stay the same for the server's lifetime
+            "SERVER_NAME": self.server_name,
+            "SERVER_PORT": str(self.server_port),
+        }
+
         self.headers_set = []
         self.application = None
         self.client_connection = None
         self.request_data = None
+        self.request_body = None
         self.request_method = None
         self.path = None
         self.request_version = None
@@ -39,16 +75,31 @@ class WSGIServer:
     def serve_forever(self):
         while True:
             self.client_connection, _ = self.server_socket.accept()
+            # Send small responses immediately instead of letting Nagle's
+            # algorithm hold them back, and let the kernel clean up dead
+            # connections:
+            self.client_connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.client_connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
             self.handle_one_request()
 
     def handle_one_request(self):
-        data = self.client_connection.recv(1024)
-        self.request_data = data.decode("utf-8")
+        data = self.client_connection.recv(65536)
+        # Keep the raw bytes - only the request line is ever decoded; the
+        # whole-buffer utf-8 decode is gone:
+        self.request_data = data
+
+        head_end = data.find(b"\r\n\r\n")
+        head = data if head_end == -1 else data[:head_end]
+        self.request_body = b"" if head_end == -1 else data[head_end + 4:]
 
-        # Print out formatted request data
-        print("".join(f"< {line}\n" for line in self.request_data.splitlines()))
+        # Log formatted request head; the join/decode only runs when DEBUG is on:
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "%s",
+                "".join(f"< {line}\n" for line in head.decode(HEADER_ENCODING).splitlines()),
+            )
 
-        self.parse_request(self.request_data)
+        self.parse_request(data)
 
         env = self.get_environ()
 
@@ -58,28 +109,24 @@ class WSGIServer:
         # Build response and send it back to the client
         self.finish_response(result)
 
-    def parse_request(self, request: str):
+    def parse_request(self, request: bytes):
         # First line of the HTTP request, aka request line,
-        # goes like "GET / HTTP/1.1\r\n"
-        request_line = request.splitlines()[0]
-        request_line = request_line.rstrip("\r\n")
-        (self.request_method, self.path, self.request_version) = request_line.split()
+        # goes like "GET / HTTP/1.1\r\n".
+        # One find + one split over the line, instead of splitlines/rstrip/
+        # split making three passes over the whole buffer:
+        request_line = request[: request.find(b"\r\n")]
+        method, path, version = request_line.split(b" ", 2)
+        self.request_method = method.decode("ascii")
+        self.path = path.decode("ascii")
+        self.request_version = version.decode("ascii")
 
     def get_environ(self) -> dict:
-        env = {}
-        # Required WSGI variables
-        env["wsgi.version"] = (1, 0)
-        env["wsgi.url_scheme"] = "http"
-        env["wsgi.input"] = io.StringIO(self.request_data)
-        env["wsgi.errors"] = sys.stderr
-        env["wsgi.multithread"] = False
-        env["wsgi.multiprocess"] = False
-        env["wsgi.run_once"] = False
-        # Required CGI variables
+        env = self._env_proto.copy()
+        # Only the per-request keys are filled in here.
+        # PEP 3333 requires a bytestream; only the body goes in, not the head:
+        env["wsgi.input"] = io.BytesIO(self.request_body)
         env["REQUEST_METHOD"] = self.request_method
         env["PATH_INFO"] = self.path
-        env["SERVER_NAME"] = self.server_name
-        env["SERVER_PORT"] = str(self.server_port)
         return env
 
     def start_response(self, status, response_headers, exc_info=None):
@@ -93,15 +140,39 @@ class WSGIServer:
     def finish_response(self, result):
         try:
             status, response_headers = self.headers_set
-            response = f"HTTP/1.1 {status}\r\n"
-            for header in response_headers:
-                response += "{0}: {1}\r\n".format(*header)
-            response += "\r\n"
-            for data in result:
-                response += data.decode("utf-8")
-            print("".join(f"> {line}\n" for line in response.splitlines()))
-            response_bytes = response.encode()
-            self.client_connection.sendall(response_bytes)
+            status_line = STATUS_LINES.get(status) or f"HTTP/1.1 {status}\r\n".encode(
+                HEADER_ENCODING
+            )
+
+            # Collect encoded pieces and join once - no quadratic string
+            # concatenation, and body bytes from the app are passed through
+            # without a decode/re-encode round-trip:
+            parts = [status_line]
+            parts.extend(
+                f"{name}: {value}\r\n".encode(HEADER_ENCODING)
+                for name, value in response_headers
+            )
+            parts.append(b"\r\n")
+
+            head = b"".join(parts)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    "%s",
+                    "".join(f"> {line}\n" for line in head.decode(HEADER_ENCODING).splitlines()),
+                )
+
+            # Scatter-gather send: the head and the app's body chunks go to
+            # the kernel as one writev(2), without gluing them together in
+            # Python first. Platforms without sendmsg fall back to one join:
+            buffers = [head, *result]
+            if hasattr(self.client_connection, "sendmsg"):
+                sent = self.client_connection.sendmsg(buffers)
+                total = sum(len(buffer) for buffer in buffers)
+                if sent < total:
+                    # Rare partial send - push the remainder the simple way:
+                    self.client_connection.sendall(b"".join(buffers)[sent:])
+            else:
+                self.client_connection.sendall(b"".join(buffers))
         finally:
             self.client_connection.close()
 
@@ -124,10 +195,34 @@ if __name__ == "__main__":
     module = __import__(module)
     application = getattr(module, application)
 
-    httpd = make_server(SERVER_ADDRESS, application)
-    print(f"🚀 WSGIServer: Serving HTTP on port {PORT}...\n")
+    # Set LOG_LEVEL=DEBUG to see the request/response dumps:
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(message)s",
+    )
+
+    # Pre-fork one worker per CPU core; each child binds its own socket to
+    # the same port via SO_REUSEPORT and the kernel spreads accepts across
+    # them, so the single-process Python server is no longer capped by one core:
+    workers = os.cpu_count() or 1
+    print(f"🚀 WSGIServer: Serving HTTP on port {PORT} with {workers} worker(s)...\n")
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            httpd = make_server(SERVER_ADDRESS, application)
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            os._exit(0)
+        children.append(pid)
 
     try:
-        httpd.serve_forever()
-    except KeyboardInterrupt as ex:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
         print("Server stopped by user.")